@@ -1,6 +1,61 @@
 import struct
 import csv
+import json
 import os
+import queue
+import threading
+from contextlib import closing
+from bisect import bisect_right
+from collections import deque
+from operator import attrgetter
+
+# 事件窗口模式：只扫描以下廉价的触发通道（0x600 用于时间同步）
+TRIGGER_IDS = (0x600, 0x570, 0x603, 0x60C)
+# Speed2D 在 SPEED_DROP_WINDOW 毫秒内下降超过 SPEED_DROP（m/s）视为制动事件
+SPEED_DROP = 1.0
+SPEED_DROP_WINDOW = 1000.0
+
+# 数据校验：物理上不可能的信号取值范围，信号名 -> (所属 ID, 下限, 上限)
+SIGNAL_LIMITS = {
+    'PosLat': (0x601, -90.0, 90.0),
+    'PosLon': (0x601, -180.0, 180.0),
+    'Altitude': (0x602, -500.0, 9000.0),
+    'Speed2D': (0x603, 0.0, 80.0),
+    'VelForward': (0x604, -80.0, 80.0),
+    'VelLateral': (0x604, -80.0, 80.0),
+    'AccelX': (0x605, -50.0, 50.0),
+    'AccelY': (0x605, -50.0, 50.0),
+    'AccelZ': (0x605, -50.0, 50.0),
+    'AccelForward': (0x606, -50.0, 50.0),
+    'AccelLateral': (0x606, -50.0, 50.0),
+    'AnglePitch': (0x607, -90.0, 90.0),
+    'AngleRoll': (0x607, -180.0, 180.0),
+    'PosLocalX': (0x60C, -10000.0, 10000.0),
+    'PosLocalY': (0x60C, -10000.0, 10000.0),
+}
+# RT 系列报文（0x600~0x60F）的解码偏移都按 8 字节 payload 设计
+RT_ID_RANGE = (0x600, 0x60F)
+# 0x600 同步报文间隔超过中位数的该倍数记为同步中断
+SYNC_GAP_FACTOR = 3.0
+# 0x600 报文内时间与 timeOffset 的增量相差超过该值（ms）记为时间跳变
+SYNC_JUMP_MS = 50.0
+# 质量报告中每类问题最多保留的示例数
+MAX_ISSUE_EXAMPLES = 20
+
+# 多分辨率摘要（min/max/mean 金字塔）的桶宽（秒），每一级须是最细一级的整数倍
+PYRAMID_LEVELS = (1, 10, 60)
+# CSV 中前 7 列为报文信息，其后为解码信号
+SIGNAL_START = 7
+
+# 流水线转换：读/写线程与解码线程之间有界队列的默认深度（块数），0 表示串行处理
+QUEUE_DEPTH = 8
+# 读线程每块预读的字节数（readlines 的 hint）
+READ_CHUNK_BYTES = 1 << 20
+# 写线程每批写出的行数
+WRITE_BATCH_ROWS = 2000
+
+# GetFloats 中 fmt 对应的字段字节数
+_FIELD_SIZES = {1: 2, 2: 2, 4: 4, 8: 8}
 
 class CANMessageInfo:
     def __init__(self, lineString, timeMs=None):
@@ -21,6 +76,8 @@ class CANMessageInfo:
         # tokens[2] 和 tokens[3]（总线号、方向）不作处理
         self.messageId = int(tokens[4], 16)
         self.length = int(tokens[6])
+        # 行内实际给出的 payload 字节数，用于与 DLC 比对
+        self.payloadTokens = len(tokens) - 7
         # 解析 payload：从 tokens[7] 开始取 length 个字节
         payload_tokens = tokens[7:7+self.length]
         self.payload = bytearray(int(tok, 16) for tok in payload_tokens)
@@ -79,7 +136,11 @@ class CANMessageInfo:
           - fmt == 4: 按有符号 32 位解析  
           - fmt == 8: 按有符号 64 位解析  
           - 未提供 fmt，则默认按 Int16 解析。
+        payload 不足以解析该字段时返回 "N/A"（由 TraceValidator 记为 shortPayload），
+        不再用 0 冒充真实数据。
         """
+        if len(self.payload) < offset + _FIELD_SIZES.get(fmt, 2):
+            return "N/A"
 
         if fmt is None:
             return self._get_int16(offset) * factor
@@ -117,19 +178,426 @@ class CANMessageInfo:
             return 0  # 这里返回0作为默认值
         return struct.unpack_from('<h', self.payload, offset)[0]
 
+def _IterRecordLines(lines, validator=None):
+    """
+    依次返回 (行号, 去掉首尾空白的行)：跳过空行、';' 注释行（文件头）
+    以及长度不大于 40 的行。C# 中固定跳过前 21 行，文件头长度不同时会丢数据或
+    把文件头当数据，这里改为按注释行识别文件头。
+    给定 validator 时，被跳过的短行也交给它记录。
+    """
+    lineNumber = 0
+    for s in lines:
+        lineNumber += 1
+        s = s.strip()
+        # 跳过空行或以 ';' 开头的注释行
+        if not s or s.startswith(';'):
+            continue
+        # 仅处理长度大于 40 的行
+        if len(s) <= 40:
+            if validator is not None:
+                validator.SkipLine(lineNumber, s)
+            continue
+        yield lineNumber, s
+
+
+def FindEventWindows(lines, before=10.0, after=5.0):
+    """
+    只扫描触发通道，找出制动/碰撞事件，返回按时间偏移（毫秒，即 .trc 中的 timeOffset）
+    排序并合并后的窗口列表 [(start, end), ...]。触发条件：
+      - 0x570 制动灯报文
+      - 0x603 Speed2D 在 SPEED_DROP_WINDOW 内下降超过 SPEED_DROP
+      - 0x60C PosLocalX 由正变为非正（越过假人位置）
+    每个事件取 [t - before, t + after] 秒的窗口，
+    与 4_Draw_Testdata.py 中 time_rt[c] ± 10 的画图窗口对应。
+    """
+    beforeMs = before * 1000.0
+    afterMs = after * 1000.0
+    events = []
+    speedMax = deque()  # 单调递减队列 (timeOffset, Speed2D)，队首为窗口内最大值
+    speedRearm = float('-inf')
+    lastPosLocalX = None
+
+    for lineNumber, s in _IterRecordLines(lines):
+        tokens = s.split(None, 5)
+        try:
+            messageId = int(tokens[4], 16)
+        except (IndexError, ValueError):
+            continue
+        if messageId not in TRIGGER_IDS or messageId == 0x600:
+            continue
+        try:
+            msg = CANMessageInfo(s)
+        except Exception:
+            continue
+        t = msg.timeOffset
+
+        if messageId == 0x570:
+            events.append(t)
+        elif messageId == 0x603 and len(msg.payload) >= 8:
+            speed = msg.GetFloats(offset=6, factor=0.01, fmt=2)
+            while speedMax and speedMax[-1][1] <= speed:
+                speedMax.pop()
+            speedMax.append((t, speed))
+            while speedMax[0][0] < t - SPEED_DROP_WINDOW:
+                speedMax.popleft()
+            if t >= speedRearm and speedMax[0][1] - speed >= SPEED_DROP:
+                events.append(t)
+                speedRearm = t + afterMs
+        elif messageId == 0x60C and len(msg.payload) >= 8:
+            posLocalX = msg.GetFloats(offset=0, factor=0.0001, fmt=4)
+            if lastPosLocalX is not None and lastPosLocalX > 0 >= posLocalX:
+                events.append(t)
+            lastPosLocalX = posLocalX
+
+    windows = []
+    for t in sorted(events):
+        start, end = t - beforeMs, t + afterMs
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return [tuple(w) for w in windows]
+
+
+class TraceValidator:
+    """
+    在 CANMessage 的单次解码循环中顺带做数据校验，不需要再读一遍文件：
+      - 解析失败的行、被跳过的短行
+      - DLC 与行内 payload 字节数不一致、RT 报文 payload 不足 8 字节
+      - 消息编号不连续、timeOffset 倒退
+      - 0x600 同步报文间隔异常、报文内时间与 timeOffset 增量不一致
+      - 超出 SIGNAL_LIMITS 的物理不可能值
+    Report() 返回可写成 JSON 的质量报告，ok 为 False 的试验可直接从目录中剔除。
+    """
+    def __init__(self, header):
+        self.counts = {
+            'messages': 0,
+            'parseErrors': 0,
+            'skippedLines': 0,
+            'dlcMismatch': 0,
+            'shortPayload': 0,
+            'numberGaps': 0,
+            'missingMessages': 0,
+            'offsetBackwards': 0,
+            'syncFrames': 0,
+            'syncGaps': 0,
+            'syncJumps': 0,
+            'outOfRange': 0,
+        }
+        self.examples = {}
+        self.firstDataLine = None
+        self._lastNumber = None
+        self._lastOffset = None
+        self._lastSync = None
+        self._syncIntervals = []
+        # messageId -> [(列下标, 信号名, 下限, 上限), ...]
+        self._limits = {}
+        for i, col in enumerate(header):
+            name = col.split()[0]
+            if name in SIGNAL_LIMITS:
+                messageId, low, high = SIGNAL_LIMITS[name]
+                self._limits.setdefault(messageId, []).append((i, name, low, high))
+
+    def _Issue(self, kind, lineNumber, detail, count=1):
+        self.counts[kind] += count
+        examples = self.examples.setdefault(kind, [])
+        if len(examples) < MAX_ISSUE_EXAMPLES:
+            examples.append({'line': lineNumber, 'detail': detail})
+
+    def _CheckSequence(self, lineNumber, number, offset):
+        if self.firstDataLine is None:
+            self.firstDataLine = lineNumber
+        if self._lastNumber is not None and number != self._lastNumber + 1:
+            missing = number - self._lastNumber - 1
+            self._Issue('numberGaps', lineNumber, f"{self._lastNumber} -> {number}")
+            if missing > 0:
+                self.counts['missingMessages'] += missing
+        if self._lastOffset is not None and offset < self._lastOffset:
+            self._Issue('offsetBackwards', lineNumber, f"{self._lastOffset} -> {offset}")
+        self._lastNumber = number
+        self._lastOffset = offset
+
+    def _CheckLineSequence(self, lineNumber, s):
+        tokens = s.split(None, 2)
+        try:
+            self._CheckSequence(lineNumber, int(tokens[0].rstrip(')')), float(tokens[1]))
+        except (IndexError, ValueError):
+            pass
+
+    def SkipLine(self, lineNumber, s):
+        """ 记录未完整解码的行（短行或事件窗口外），仍参与编号与时间连续性检查 """
+        self.counts['skippedLines'] += 1
+        self._CheckLineSequence(lineNumber, s)
+
+    def ParseError(self, lineNumber, s, error):
+        self._Issue('parseErrors', lineNumber, f"{s} ({error})")
+        self._CheckLineSequence(lineNumber, s)
+
+    def CheckMessage(self, lineNumber, msg):
+        self.counts['messages'] += 1
+        self._CheckSequence(lineNumber, msg.messageNumber, msg.timeOffset)
+        if msg.payloadTokens != msg.length:
+            self._Issue('dlcMismatch', lineNumber,
+                        f"ID {msg.messageId:#x} DLC {msg.length}, payload {msg.payloadTokens}")
+        if RT_ID_RANGE[0] <= msg.messageId <= RT_ID_RANGE[1] and len(msg.payload) < 8:
+            self._Issue('shortPayload', lineNumber,
+                        f"ID {msg.messageId:#x} payload {len(msg.payload)}")
+        if msg.messageId == 0x600:
+            self.counts['syncFrames'] += 1
+            if self._lastSync is not None:
+                lastOffset, lastTimeMs = self._lastSync
+                interval = msg.timeOffset - lastOffset
+                self._syncIntervals.append((lineNumber, interval))
+                drift = (msg.GetTimeMs() - lastTimeMs) - interval
+                if abs(drift) > SYNC_JUMP_MS:
+                    self._Issue('syncJumps', lineNumber, f"{drift:.1f} ms")
+            self._lastSync = (msg.timeOffset, msg.GetTimeMs())
+
+    def CheckRow(self, lineNumber, msg, row):
+        for i, name, low, high in self._limits.get(msg.messageId, ()):
+            value = row[i]
+            if value != "N/A" and not (low <= value <= high):
+                self._Issue('outOfRange', lineNumber, f"{name}={value}")
+
+    def Report(self, fileName):
+        # 同步间隔以中位数为基准判断中断，不需要预先知道 RT 的输出频率
+        medianInterval = None
+        if self._syncIntervals:
+            intervals = sorted(i for _, i in self._syncIntervals)
+            medianInterval = intervals[len(intervals) // 2]
+            for lineNumber, interval in self._syncIntervals:
+                if interval > SYNC_GAP_FACTOR * medianInterval:
+                    self._Issue('syncGaps', lineNumber, f"{interval:.1f} ms")
+            self._syncIntervals = []
+        counts = self.counts
+        ok = (counts['messages'] > 0 and counts['syncFrames'] > 0 and
+              not any(counts[k] for k in ('parseErrors', 'dlcMismatch', 'shortPayload',
+                                          'missingMessages', 'offsetBackwards',
+                                          'syncGaps', 'syncJumps', 'outOfRange')))
+        return {
+            'file': fileName,
+            'ok': ok,
+            'headerLines': None if self.firstDataLine is None else self.firstDataLine - 1,
+            'syncIntervalMs': medianInterval,
+            'counts': dict(counts),
+            'examples': self.examples,
+        }
+
+
+class SummaryPyramid:
+    """
+    在解码循环中逐行累计各信号的 min/max/sum/count（按最细一级的桶），
+    结束时再合并出较粗的各级，写成：
+      outDir/<桶宽>s/<信号名>.csv   列为 TimeSec, Min, Max, Mean, Count
+      outDir/index.json             各级桶宽、各信号时间范围
+    浏览长时间数据时按显示范围选取合适的级别，只需读取几 KB（见 9_Browse_Pyramid.py）。
+    """
+    @staticmethod
+    def CheckLevels(levels):
+        """ 每一级都须是最细一级的正整数倍，否则合并出的桶宽与标注不符 """
+        levels = sorted(levels)
+        for level in levels:
+            if level <= 0 or level % levels[0] != 0:
+                raise ValueError(f"摘要级别 {levels} 中的 {level} 不是最细一级的整数倍")
+        return levels
+
+    def __init__(self, header, levels=PYRAMID_LEVELS):
+        self.levels = self.CheckLevels(levels)
+        self.names = [col.split()[0] for col in header]
+        self._baseMs = self.levels[0] * 1000.0
+        # 列下标 -> {桶序号: [min, max, sum, count]}
+        self._buckets = {}
+
+    def AddRow(self, timeMs, row):
+        bucketIndex = int(timeMs // self._baseMs)
+        for i in range(SIGNAL_START, len(row)):
+            value = row[i]
+            if value == "N/A":
+                continue
+            buckets = self._buckets.get(i)
+            if buckets is None:
+                buckets = self._buckets[i] = {}
+            b = buckets.get(bucketIndex)
+            if b is None:
+                buckets[bucketIndex] = [value, value, value, 1]
+            else:
+                if value < b[0]:
+                    b[0] = value
+                elif value > b[1]:
+                    b[1] = value
+                b[2] += value
+                b[3] += 1
+
+    def _Merge(self, buckets, factor):
+        merged = {}
+        for k, (low, high, total, count) in buckets.items():
+            m = merged.get(k // factor)
+            if m is None:
+                merged[k // factor] = [low, high, total, count]
+            else:
+                m[0] = min(m[0], low)
+                m[1] = max(m[1], high)
+                m[2] += total
+                m[3] += count
+        return merged
+
+    def Write(self, outDir):
+        # 没有任何信号数据时也生成目录和空的 index.json
+        os.makedirs(outDir, exist_ok=True)
+        index = {'levels': self.levels, 'signals': {}}
+        for i, buckets in self._buckets.items():
+            name = self.names[i]
+            for level in self.levels:
+                factor = int(level // self.levels[0])
+                merged = buckets if factor == 1 else self._Merge(buckets, factor)
+                levelDir = os.path.join(outDir, f"{level}s")
+                os.makedirs(levelDir, exist_ok=True)
+                with open(os.path.join(levelDir, name + ".csv"), 'w', newline='',
+                          encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["TimeSec", "Min", "Max", "Mean", "Count"])
+                    for k in sorted(merged):
+                        low, high, total, count = merged[k]
+                        writer.writerow([k * level, low, high, total / count, count])
+            keys = sorted(buckets)
+            index['signals'][name] = {
+                'start': keys[0] * self.levels[0],
+                'end': (keys[-1] + 1) * self.levels[0],
+            }
+        with open(os.path.join(outDir, "index.json"), 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+
+
+def _PrefetchLines(f_in, queueDepth, chunkBytes=READ_CHUNK_BYTES):
+    """
+    逐行返回已打开文件 f_in 的内容。queueDepth > 0 时由后台读线程按块
+    （readlines(chunkBytes)）预读，经深度为 queueDepth 的有界队列交给解码线程，
+    网络存储上读等待与解码可以重叠，内存中最多只有 queueDepth 块未处理的数据；
+    queueDepth 为 0 时整文件读入。
+    读线程在第一次取行时才启动，调用方应以 closing() 包裹，出错提前结束时也会停止读线程。
+    """
+    if queueDepth <= 0:
+        yield from f_in.readlines()
+        return
+
+    chunks = queue.Queue(maxsize=queueDepth)
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                chunk = f_in.readlines(chunkBytes)
+                if not chunk:
+                    break
+                chunks.put(chunk)
+            chunks.put(None)
+        except Exception as e:
+            chunks.put(e)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield from chunk
+    finally:
+        # 提前结束时读线程可能阻塞在 put 上，清空队列让它退出
+        stop.set()
+        while thread.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class _RowWriter:
+    """
+    与 csv.writer 相同的 writerow 接口。queueDepth > 0 时由后台写线程写出：
+    解码线程每攒够 WRITE_BATCH_ROWS 行放入有界队列，队列满时解码线程等待写线程；
+    queueDepth 为 0 时直接同步写出。退出 with 时写完剩余数据并等待写线程结束。
+    """
+    def __init__(self, f_out, queueDepth):
+        self._writer = csv.writer(f_out)
+        self._batch = []
+        self._error = None
+        self._queue = None
+        if queueDepth > 0:
+            self._queue = queue.Queue(maxsize=queueDepth)
+            self._thread = threading.Thread(target=self._Run, daemon=True)
+            self._thread.start()
+
+    def _Run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            # 出错后继续取空队列，避免解码线程阻塞在 put 上
+            if self._error is None:
+                try:
+                    self._writer.writerows(batch)
+                except Exception as e:
+                    self._error = e
+
+    def writerow(self, row):
+        if self._queue is None:
+            self._writer.writerow(row)
+            return
+        self._batch.append(row)
+        if len(self._batch) >= WRITE_BATCH_ROWS:
+            if self._error is not None:
+                raise self._error
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self._queue is None:
+            return False
+        if excType is None and self._batch:
+            self._queue.put(self._batch)
+        self._batch = []
+        self._queue.put(None)
+        self._thread.join()
+        if excType is None and self._error is not None:
+            raise self._error
+        return False
+
+
 class CANMessage:
-    def __init__(self, fileName):
+    def __init__(self, fileName, eventWindow=None, pyramidLevels=PYRAMID_LEVELS,
+                 queueDepth=QUEUE_DEPTH):
         """
         解析 .trc 文件中的 CAN 消息，并生成 CSV 文件。  
         逻辑说明（参考 C# 代码）：  
-          - 跳过前 21 行（及空行或注释行）  
+          - 跳过文件头（';' 注释行）及空行  
           - 仅解析长度大于 40 的行  
           - 如果遇到 messageId==0x600 的消息，则用 GetTimeMs() 得到绝对时间，
             同时调整之前所有消息的时间戳  
           - 其它消息的时间戳根据上一个 0x600 消息的时间偏移累加计算
           - 解析结果写入与源文件同名但扩展名为 .csv 的文件中
+        eventWindow：(事件前秒数, 事件后秒数)，例如 (10, 5)。给定时先用
+        FindEventWindows 扫描触发通道，只完整解码并写出事件窗口内的报文，
+        结果写入 <源文件名>_events.csv；0x600 同步报文始终参与时间计算。
+        解码过程中由 TraceValidator 做数据校验，质量报告保存在 self.quality，
+        并写入 <输出 CSV 名>_quality.json（事件窗口模式为 <源文件名>_events_quality.json）。
+        pyramidLevels：同时写出的 min/max/mean 摘要金字塔的各级桶宽（秒），
+        保存在 <输出 CSV 名>_pyramid/ 目录下；为 None 时不生成。
+        queueDepth：流水线中读、写队列的深度。大于 0 时由读线程预读、写线程写出，
+        与解码重叠（适合 NAS 等慢速存储，可按需调大）；为 0 时整文件读入后串行处理。
         """
+        if pyramidLevels:
+            # 在生成任何输出之前检查摘要级别
+            SummaryPyramid.CheckLevels(pyramidLevels)
         self.messageList = []
+        # 按 ID 分组的报文流（messageId -> list），与 messageList 共享同一批对象
+        self.messageStreams = {}
+        self.eventWindows = None
         lastTimeMessage = None
         ifTimeMessage = False
         PosLat = None
@@ -169,13 +637,23 @@ class CANMessage:
         base, _ = os.path.splitext(fileName)
         csv_filename = base + ".csv"
 
-        with open(fileName, 'r', encoding='utf-8') as f_in:
-            lines = f_in.readlines()
+        if eventWindow is not None:
+            csv_filename = base + "_events.csv"
+
+        # 先打开源文件，文件不存在等错误在生成 CSV 之前抛出；
+        # 预读线程只在输出打开后开始取行时启动，退出 with 时（包括出错）一定会停止
+        f_in = open(fileName, 'r', encoding='utf-8')
+        with f_in, open(csv_filename, 'w', newline='', encoding='utf-8') as f_out, \
+                _RowWriter(f_out, queueDepth) as writer, \
+                closing(_PrefetchLines(f_in, queueDepth)) as lines:
+            if eventWindow is not None:
+                # 先扫描触发通道再解码，需要遍历两遍
+                lines = list(lines)
+                self.eventWindows = FindEventWindows(lines, *eventWindow)
+                windowStarts = [w[0] for w in self.eventWindows]
 
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as f_out:
-            writer = csv.writer(f_out)
             # 写入 CSV 表头
-            writer.writerow([
+            header = [
                 "MessageNumber",
                 "TimeOffset",
                 "MessageID(hex)",
@@ -199,24 +677,35 @@ class CANMessage:
                 "AngAccelForward °/s²","AngAccelLateral °/s²"
 
 
-            ])
+            ]
+            writer.writerow(header)
+            validator = TraceValidator(header)
+            pyramid = SummaryPyramid(header, pyramidLevels) if pyramidLevels else None
+            # 第一个 0x600 之前的行暂存，待时间戳校正后再加入摘要，避免出现 0 s 附近的桶
+            preSyncRows = []
 
-            lineNumber = 0
-            for s in lines:
-                lineNumber += 1
-                s = s.strip()
-                # 跳过空行或以 ';' 开头的注释行
-                if not s or s.startswith(';'):
-                    continue
-                # 按 C# 代码逻辑：仅处理第 22 行及以后且长度大于 40 的行
-                if lineNumber < 21 or len(s) <= 40:
-                    continue
+            for lineNumber, s in _IterRecordLines(lines, validator):
+                inWindow = True
+                if self.eventWindows is not None:
+                    # 只取时间偏移和 ID 判断是否在窗口内，窗口外的报文不做完整解码
+                    tokens = s.split(None, 5)
+                    try:
+                        offset = float(tokens[1])
+                        i = bisect_right(windowStarts, offset) - 1
+                        inWindow = i >= 0 and offset <= self.eventWindows[i][1]
+                        if not inWindow and int(tokens[4], 16) != 0x600:
+                            validator.SkipLine(lineNumber, s)
+                            continue
+                    except (IndexError, ValueError):
+                        pass
 
                 try:
                     msg = CANMessageInfo(s)
                 except Exception as e:
                     print(f"解析第 {lineNumber} 行时出错: {s}\n错误信息: {e}")
+                    validator.ParseError(lineNumber, s, e)
                     continue
+                validator.CheckMessage(lineNumber, msg)
 
 #####################################################################################
                 if msg.messageId == 0x600:
@@ -226,12 +715,23 @@ class CANMessage:
                         # 调整之前所有消息的时间戳
                         for m in self.messageList:
                             m.timeMs = msg.timeMs - (msg.timeOffset - m.timeOffset)
+                        if pyramid is not None:
+                            for m, r in preSyncRows:
+                                pyramid.AddRow(m.timeMs, r)
+                            preSyncRows = []
                     lastTimeMessage = msg
                 elif ifTimeMessage and lastTimeMessage is not None:
                     msg.timeMs = (lastTimeMessage.timeMs +
                                   (msg.timeOffset - lastTimeMessage.timeOffset))
 
+                if not inWindow:
+                    continue
                 self.messageList.append(msg)
+                stream = self.messageStreams.get(msg.messageId)
+                if stream is None:
+                    self.messageStreams[msg.messageId] = [msg]
+                else:
+                    stream.append(msg)
 #####################################################################################
                 # # 如果消息 ID 为 0x601，则用 payload 中的数据更新 Pos
                 if msg.messageId == 0x601 and len(msg.payload) >= 2:
@@ -342,7 +842,7 @@ class CANMessage:
                     AngAccelForward   = "N/A"
                     AngAccelLateral   = "N/A"
                 # 写入 CSV 一行
-                writer.writerow([
+                row = [
                     msg.messageNumber,
                     msg.timeOffset,
                     hex(msg.messageId),
@@ -365,8 +865,26 @@ class CANMessage:
                     VelLocalX,VelLocalY,AngleLocalYaw,AngleLocalTrack,
                     AngAccelForward,AngAccelLateral  
     
-                ])
+                ]
+                validator.CheckRow(lineNumber, msg, row)
+                if pyramid is not None:
+                    if ifTimeMessage:
+                        pyramid.AddRow(msg.timeMs, row)
+                    else:
+                        preSyncRows.append((msg, row))
+                writer.writerow(row)
 
+        self.csvFileName = csv_filename
+        # 质量报告先于摘要写出，摘要出错时报告仍然保留
+        self.quality = validator.Report(fileName)
+        with open(os.path.splitext(csv_filename)[0] + "_quality.json", 'w',
+                  encoding='utf-8') as f_report:
+            json.dump(self.quality, f_report, ensure_ascii=False, indent=2)
+        if pyramid is not None:
+            # 整个文件都没有同步报文时，按原始时间偏移加入
+            for m, r in preSyncRows:
+                pyramid.AddRow(m.timeMs, r)
+            pyramid.Write(os.path.splitext(csv_filename)[0] + "_pyramid")
         print(f"解析完成，结果已写入: {csv_filename}")
 
     @property
@@ -380,8 +898,19 @@ class CANMessage:
         """
         if id is None:
             return self.messageList
-        filtered = [m for m in self.messageList if m.messageId == id]
-        return filtered if filtered else None
+        return self.messageStreams.get(id)
+
+    def SortByTime(self):
+        """
+        按 timeMs 排序 messageList 及各 ID 的报文流。  
+        报文基本按时间到达，只有 0x600 同步前回推的报文和 GetBreakLight 改写的 0x570
+        不在原位，Timsort 会直接利用已有的有序段，接近线性；key 用 C 实现的
+        attrgetter 直接读取 _timeMs，不再对每个元素调用一次 Python lambda 和 property。
+        """
+        key = attrgetter('_timeMs')
+        self.messageList.sort(key=key)
+        for stream in self.messageStreams.values():
+            stream.sort(key=key)
 
     def GetBreakLight(self):
         """
@@ -522,7 +1051,7 @@ class MessageDecode:
         self.canData = CANMessage(fileCan)
         self.carrierData = LocalMessage(fileLocal)
         # 按时间排序 CAN 消息
-        self.canData.messageList.sort(key=lambda m: m.timeMs)
+        self.canData.SortByTime()
 
 
 
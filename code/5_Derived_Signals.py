@@ -0,0 +1,240 @@
+import ast
+import os
+import numpy as np
+import pandas as pd
+
+# 1_CANInfo_Read.py 输出 CSV 中，前 7 列为报文信息，其后为各解码信号列
+TIME_COL = 'TimeMs'
+OFFSET_COL = 'TimeOffset'
+FRONT_COLS = 7
+
+# 重采样时，网格点所在的两个相邻原始采样点间隔超过该信号中位采样周期的 GAP_FACTOR 倍，
+# 视为数据中断（GNSS/RT 丢失、事件窗口之间的空档），该点置为 NaN 而不做插值
+GAP_FACTOR = 5
+
+# 派生信号注册表：name -> (输入信号名元组, 计算函数)
+# 计算函数接收 frame（列名 -> 等长 ndarray，含 'TimeSec'），返回与 TimeSec 等长的 ndarray
+DERIVED_SIGNALS = {}
+
+
+def register_signal(name, inputs):
+    """
+    以装饰器方式注册派生信号。inputs 为所依赖的信号（可以是已注册的派生信号），
+    计算时若 frame 中缺少任一输入则跳过该信号。
+    """
+    def decorator(func):
+        DERIVED_SIGNALS[name] = (tuple(inputs), func)
+        return func
+    return decorator
+
+
+def register_expression(name, expression):
+    """
+    用表达式字符串注册派生信号，例如：
+        register_expression('SpeedKmh', 'Speed2D * 3.6')
+        register_expression('LateralJerk', 'deriv(smooth(AccelLateral, 5))')
+    表达式中可使用信号列名、numpy（np）以及 deriv / smooth 两个辅助函数，
+    所有运算均对整列向量化进行，不需要再遍历一遍数据。
+    """
+    tree = ast.parse(expression, mode='eval')
+    code = compile(tree, f'<derived:{name}>', 'eval')
+    # 只取表达式中的变量名（ast.Name），np.abs 之类的属性名不算输入
+    inputs = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Name) and node.id not in _EXPRESSION_NAMES
+                and node.id not in inputs):
+            inputs.append(node.id)
+
+    def func(frame):
+        env = dict(_EXPRESSION_NAMES)
+        env['deriv'] = lambda x: deriv(x, frame['TimeSec'])
+        env.update({k: frame[k] for k in inputs})
+        return np.asarray(eval(code, {'__builtins__': {}}, env), dtype=float)
+
+    DERIVED_SIGNALS[name] = (tuple(inputs), func)
+
+
+def deriv(values, time_sec):
+    """ 对非均匀/均匀时间序列做中心差分（端点为单侧差分），与 NaN 相邻的点结果为 NaN """
+    if len(values) < 2:
+        return np.full(len(values), np.nan)
+    return np.gradient(values, time_sec)
+
+
+def smooth(values, window):
+    """ 居中滑动平均滤波，窗口为采样点数；NaN 不参与平均，且原为 NaN 的点仍为 NaN """
+    window = int(window)
+    if window <= 1:
+        return np.asarray(values, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    kernel = np.ones(window)
+    total = np.convolve(np.where(valid, values, 0.0), kernel, mode='same')
+    count = np.convolve(valid.astype(float), kernel, mode='same')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, total / count, np.nan)
+
+
+_EXPRESSION_NAMES = {'np': np, 'smooth': smooth, 'deriv': deriv}
+
+
+def load_signal_arrays(csv_file):
+    """
+    读取 1_CANInfo_Read.py 生成的 CSV，按信号拆成各自的 (时间[s], 数值) 数组。
+    每个信号只保留其所属 CAN ID 的行（其它行为 N/A），即按 ID 解码后的逐帧序列。
+    列名中的单位、尾随空格会被去掉，例如 'Distance ' -> 'Distance'。
+    第一个 0x600 同步报文之前写出的行 TimeMs 等于 TimeOffset（接近 0 s），
+    与之后的当日时间相差数小时，文件中有同步报文时丢弃这些行。
+    """
+    data = pd.read_csv(csv_file, na_values=['N/A'], low_memory=False)
+    time_ms = pd.to_numeric(data[TIME_COL], errors='coerce').to_numpy()
+    pre_sync = time_ms == pd.to_numeric(data[OFFSET_COL], errors='coerce').to_numpy()
+    if not pre_sync.all():
+        time_ms = np.where(pre_sync, np.nan, time_ms)
+    time_sec = time_ms / 1000.0
+    signals = {}
+    for col in data.columns[FRONT_COLS:]:
+        name = col.split()[0]
+        values = pd.to_numeric(data[col], errors='coerce').to_numpy()
+        mask = ~np.isnan(values) & ~np.isnan(time_sec)
+        if not mask.any():
+            continue
+        t, v = time_sec[mask], values[mask]
+        order = np.argsort(t, kind='stable')
+        signals[name] = (t[order], v[order])
+    return signals
+
+
+def resample(signals, rate_hz=100.0, names=None):
+    """
+    将各信号线性插值到公共时间轴上（取各信号时间范围的交集），
+    返回 frame：{'TimeSec': t, 信号名: 数值, ...}
+    落在数据中断（相邻采样间隔大于 GAP_FACTOR 倍中位采样周期）内的网格点为 NaN。
+    """
+    names = list(signals) if names is None else [n for n in names if n in signals]
+    if not names:
+        return {'TimeSec': np.empty(0)}
+    start = max(signals[n][0][0] for n in names)
+    stop = min(signals[n][0][-1] for n in names)
+    if stop <= start:
+        return {'TimeSec': np.empty(0), **{n: np.empty(0) for n in names}}
+    time_sec = np.arange(start, stop, 1.0 / rate_hz)
+    frame = {'TimeSec': time_sec}
+    for n in names:
+        t, v = signals[n]
+        values = np.interp(time_sec, t, v)
+        step = np.diff(t)
+        if (step > 0).any():
+            period = np.median(step[step > 0])
+            right = np.clip(np.searchsorted(t, time_sec, side='right'), 1, len(t) - 1)
+            left = right - 1
+            gap = (t[right] - t[left] > GAP_FACTOR * period) & (time_sec != t[left])
+            values[gap] = np.nan
+        frame[n] = values
+    return frame
+
+
+def compute_derived(frame, names=None):
+    """
+    按注册顺序计算派生信号并作为新列加入 frame（原地修改并返回）。
+    names 为空时计算所有输入齐全的派生信号；给定 names 时其依赖的派生信号也会一并计算。
+    """
+    if names is not None:
+        names = set(names)
+        pending = list(names)
+        while pending:
+            inputs = DERIVED_SIGNALS.get(pending.pop(), ((), None))[0]
+            for i in inputs:
+                if i in DERIVED_SIGNALS and i not in names:
+                    names.add(i)
+                    pending.append(i)
+    for name, (inputs, func) in DERIVED_SIGNALS.items():
+        if names is not None and name not in names:
+            continue
+        if all(i in frame for i in inputs):
+            frame[name] = func(frame)
+    return frame
+
+
+# --------------------- 内置派生信号 ---------------------
+
+# 平滑窗口（采样点数），在 100 Hz 下约 0.1 s
+SMOOTH_WINDOW = 11
+# 判定制动的纵向减速度阈值（m/s²）
+BRAKE_DECEL = 2.0
+# 计算 TTC 时接近速度的下限（m/s），避免除零
+MIN_CLOSING_SPEED = 0.1
+
+
+@register_signal('RangeRate', ['PosLocalX'])
+def _range_rate(frame):
+    """ 0x60C 纵向相对距离的变化率（m/s），负值表示在接近 """
+    return deriv(smooth(frame['PosLocalX'], SMOOTH_WINDOW), frame['TimeSec'])
+
+
+@register_signal('ClosingSpeed', ['RangeRate'])
+def _closing_speed(frame):
+    return -frame['RangeRate']
+
+
+@register_signal('TTC', ['PosLocalX', 'ClosingSpeed'])
+def _ttc(frame):
+    """ 碰撞时间 TTC = 距离 / 接近速度（s），不在接近或已越过时为 NaN """
+    closing = frame['ClosingSpeed']
+    distance = frame['PosLocalX']
+    valid = (closing > MIN_CLOSING_SPEED) & (distance > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, distance / closing, np.nan)
+
+
+@register_signal('Jerk', ['AccelForward'])
+def _jerk(frame):
+    """ 0x606 纵向加速度的导数（m/s³），先滤波再差分 """
+    return deriv(smooth(frame['AccelForward'], SMOOTH_WINDOW), frame['TimeSec'])
+
+
+@register_signal('Braking', ['AccelForward'])
+def _braking(frame):
+    """ 制动状态（0/1）：滤波后纵向减速度超过 BRAKE_DECEL，数据中断处为 NaN """
+    accel = smooth(frame['AccelForward'], SMOOTH_WINDOW)
+    return np.where(np.isnan(accel), np.nan, (accel <= -BRAKE_DECEL).astype(float))
+
+
+register_expression('SpeedKmh', 'Speed2D * 3.6')
+
+
+def braking_onset(frame):
+    """ 返回第一次进入制动状态的时间（s），没有制动返回 None """
+    if 'Braking' not in frame:
+        return None
+    # 数据中断（NaN）按未制动处理，中断后首次出现的制动也算作起始
+    idx = np.flatnonzero(np.diff(np.nan_to_num(frame['Braking']), prepend=0.0) > 0)
+    return float(frame['TimeSec'][idx[0]]) if len(idx) else None
+
+
+def derive_csv(csv_file, rate_hz=100.0, out_file=None):
+    """
+    对单个解码 CSV 计算派生信号，并将公共时间轴上的原始信号与派生信号写入
+    同目录下 <原文件名>_derived.csv。返回 frame。
+    """
+    signals = load_signal_arrays(csv_file)
+    inputs = set()
+    for deps, _ in DERIVED_SIGNALS.values():
+        inputs.update(d for d in deps if d in signals)
+    frame = compute_derived(resample(signals, rate_hz, sorted(inputs)))
+
+    if out_file is None:
+        base, _ = os.path.splitext(csv_file)
+        out_file = base + '_derived.csv'
+    pd.DataFrame(frame).to_csv(out_file, index=False, encoding='utf-8-sig')
+    print(f"已输出: {out_file}")
+    return frame
+
+
+if __name__ == "__main__":
+    # 修改为你自己的解码 CSV 文件路径
+    input_file = r"C:\Users\17845\Desktop\子刊讨论\PCS Test Data\bicyclist\06-28-2016\DGPS and carrier data\4A-30-15-A-1-H.csv"
+
+    frame = derive_csv(input_file)
+    onset = braking_onset(frame)
+    print(f"制动起始时间: {onset if onset is not None else 'N/A'}")
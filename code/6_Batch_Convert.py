@@ -0,0 +1,340 @@
+import argparse
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+# 1_CANInfo_Read.py 文件名以数字开头，只能通过 importlib 导入
+CANInfo = importlib.import_module('1_CANInfo_Read')
+
+# 租约超过该秒数未续期即视为所属 worker 已崩溃，可被其它 worker 回收
+LEASE_TIMEOUT = 600.0
+# 转换过程中续期租约（更新 mtime）的间隔秒数
+HEARTBEAT = 30.0
+# 剩余任务都被其它 worker 持有时，重新扫描队列的间隔秒数
+POLL_INTERVAL = 1.0
+# 转换失败的任务最多尝试的次数（网络存储的临时错误可在重试时恢复）
+MAX_ATTEMPTS = 3
+# 失败任务重试前的等待秒数，第 n 次失败后等待 RETRY_BACKOFF * 2**(n-1) 秒
+RETRY_BACKOFF = 30.0
+
+
+def _convert_trc(path, eventWindow=None, queueDepth=CANInfo.QUEUE_DEPTH):
+    can_data = CANInfo.CANMessage(path, eventWindow=eventWindow, queueDepth=queueDepth)
+    # 质量报告随完成记录一起保存，quality_ok 为 False 的试验可从目录中剔除
+    return {
+        'messages': can_data.messageCount,
+        'output': can_data.csvFileName,
+        'quality_ok': can_data.quality['ok'],
+        'quality': can_data.quality['counts'],
+    }
+
+
+# 扩展名 -> 转换函数；转换函数返回写入完成记录的信息（dict）
+CONVERTERS = {
+    '.trc': _convert_trc,
+}
+
+
+class JobQueue:
+    """
+    基于共享目录的任务队列，不需要中心服务，多台机器挂载同一目录即可协同转换：
+      queue_dir/leases/<key>.lease   正在处理的任务（O_CREAT|O_EXCL 原子创建）
+      queue_dir/done/<key>.json      已成功完成的任务记录
+      queue_dir/failed/<key>.json    失败记录、尝试次数与失败时间，未达 max_attempts 时
+                                     等待退避时间后重试
+    worker 在转换期间定期更新租约 mtime；租约超时后由其它 worker 回收并重新处理。
+    租约中保存领取时生成的 token，续期、释放和记录完成前都先核对，
+    租约已被别人回收的 worker 放弃自己的结果。
+    """
+    def __init__(self, queue_dir, lease_timeout=LEASE_TIMEOUT, heartbeat=HEARTBEAT,
+                 max_attempts=MAX_ATTEMPTS, retry_backoff=RETRY_BACKOFF):
+        self.lease_dir = os.path.join(queue_dir, 'leases')
+        self.done_dir = os.path.join(queue_dir, 'done')
+        self.failed_dir = os.path.join(queue_dir, 'failed')
+        os.makedirs(self.lease_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.lease_timeout = lease_timeout
+        self.heartbeat = heartbeat
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        # key -> 本 worker 持有的租约 token
+        self._tokens = {}
+
+    def _lease_path(self, key):
+        return os.path.join(self.lease_dir, key + '.lease')
+
+    def _done_path(self, key):
+        return os.path.join(self.done_dir, key + '.json')
+
+    def _failed_path(self, key):
+        return os.path.join(self.failed_dir, key + '.json')
+
+    def is_done(self, key):
+        return os.path.exists(self._done_path(key))
+
+    def _failure(self, key):
+        """ 失败记录，没有或读取失败时返回空 dict """
+        try:
+            with open(self._failed_path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def attempts(self, key):
+        """ 已失败的次数 """
+        return self._failure(key).get('attempts', 0)
+
+    def retry_at(self, key):
+        """ 失败任务可以重试的时间（time.time()），没有失败记录时为 0 """
+        failure = self._failure(key)
+        attempts = failure.get('attempts', 0)
+        if not attempts:
+            return 0.0
+        return failure.get('failed_at', 0.0) + self.retry_backoff * 2 ** (attempts - 1)
+
+    def is_finished(self, key):
+        """ 已成功，或失败次数已达上限不再重试 """
+        return self.is_done(key) or self.attempts(key) >= self.max_attempts
+
+    def _write_json(self, path, record):
+        """ 先写临时文件再 os.replace，保证记录不会被读到一半 """
+        tmp = f"{path}.tmp-{self.owner}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def claim(self, key):
+        """ 尝试原子地领取任务，成功返回 True """
+        if self.is_finished(key) or time.time() < self.retry_at(key):
+            return False
+        lease = self._lease_path(key)
+        for _ in range(2):
+            try:
+                fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._recover_stale(key):
+                    return False
+                continue
+            token = uuid.uuid4().hex
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'owner': self.owner, 'token': token, 'claimed': time.time()}, f)
+            self._tokens[key] = token
+            # 领取期间别的 worker 可能刚好完成并释放了该任务
+            if self.is_finished(key):
+                self.release(key)
+                return False
+            return True
+        return False
+
+    def _recover_stale(self, key):
+        """
+        回收过期租约：先把租约改名（rename 原子，只有一个 worker 能成功），
+        改名后再确认确实过期；若其间租约已被续期或重新领取，则用 link 放回原处。
+        """
+        lease = self._lease_path(key)
+        try:
+            if time.time() - os.stat(lease).st_mtime < self.lease_timeout:
+                return False
+        except FileNotFoundError:
+            return True
+        stale = f"{lease}.stale-{self.owner}"
+        try:
+            os.rename(lease, stale)
+        except FileNotFoundError:
+            return True
+        try:
+            if time.time() - os.stat(stale).st_mtime < self.lease_timeout:
+                try:
+                    os.link(stale, lease)
+                except FileExistsError:
+                    pass
+                return False
+            print(f"回收过期租约: {key}")
+            return True
+        finally:
+            os.remove(stale)
+
+    def _read_token(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f).get('token')
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def owns(self, key):
+        """ 租约文件中的 token 是否仍是本 worker 领取时写入的 """
+        token = self._tokens.get(key)
+        return token is not None and self._read_token(self._lease_path(key)) == token
+
+    def renew(self, key):
+        if not self.owns(key):
+            return
+        try:
+            os.utime(self._lease_path(key))
+        except FileNotFoundError:
+            pass
+
+    def release(self, key):
+        """
+        只释放自己的租约：先把租约改名（原子）再核对 token，
+        若已属于别的 worker 则用 link 放回原处。
+        """
+        token = self._tokens.pop(key, None)
+        if token is None:
+            return
+        lease = self._lease_path(key)
+        released = f"{lease}.release-{self.owner}"
+        try:
+            os.rename(lease, released)
+        except FileNotFoundError:
+            return
+        try:
+            if self._read_token(released) != token:
+                try:
+                    os.link(released, lease)
+                except FileExistsError:
+                    pass
+        finally:
+            os.remove(released)
+
+    def complete(self, key, record):
+        """
+        记录成功或失败并释放租约。租约已被其它 worker 回收时放弃本次结果，返回 False。
+        """
+        if not self.owns(key):
+            print(f"[{self.owner}] 租约已被回收，放弃结果: {key}")
+            self._tokens.pop(key, None)
+            return False
+        if record.get('status') == 'ok':
+            self._write_json(self._done_path(key), record)
+            try:
+                os.remove(self._failed_path(key))
+            except FileNotFoundError:
+                pass
+        else:
+            record['attempts'] = self.attempts(key) + 1
+            record['failed_at'] = time.time()
+            self._write_json(self._failed_path(key), record)
+        self.release(key)
+        return True
+
+    def run(self, key, func, *args, **kwargs):
+        """ 在持有租约期间执行 func，后台线程定期续期 """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat):
+                self.renew(key)
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stop.set()
+            thread.join()
+
+
+def job_key(root_dir, path):
+    """ 由相对路径生成任务键：文件名 + 相对路径哈希，避免不同目录下同名文件冲突 """
+    rel = os.path.relpath(path, root_dir).replace(os.sep, '/')
+    digest = hashlib.sha1(rel.encode('utf-8')).hexdigest()[:12]
+    return f"{os.path.basename(path)}-{digest}"
+
+
+def find_jobs(root_dir, extensions=tuple(CONVERTERS)):
+    jobs = []
+    for current_dir, sub_dirs, files in os.walk(root_dir):
+        for file in files:
+            if os.path.splitext(file)[1].lower() in extensions:
+                jobs.append(os.path.join(current_dir, file))
+    return sorted(jobs)
+
+
+def run_worker(root_dir, queue_dir, eventWindow=None, lease_timeout=LEASE_TIMEOUT,
+               heartbeat=HEARTBEAT, queueDepth=CANInfo.QUEUE_DEPTH,
+               poll_interval=POLL_INTERVAL, max_attempts=MAX_ATTEMPTS,
+               retry_backoff=RETRY_BACKOFF):
+    """
+    单个 worker：遍历所有任务，领取到的就转换并记录结果，直到没有可领取的任务。
+    失败的任务在退避时间过后重试，直到达到 max_attempts；过期租约在下一轮扫描时被回收。
+    返回本 worker 记录了结果的任务数。
+    """
+    queue = JobQueue(queue_dir, lease_timeout, heartbeat, max_attempts, retry_backoff)
+    jobs = find_jobs(root_dir)
+    # 打乱顺序以减少多个 worker 同时争抢同一任务
+    random.shuffle(jobs)
+    processed = 0
+    while True:
+        pending = False
+        for path in jobs:
+            key = job_key(root_dir, path)
+            if queue.is_finished(key):
+                continue
+            pending = True
+            if not queue.claim(key):
+                continue
+            print(f"[{queue.owner}] 正在处理文件: {path}")
+            record = {'file': path, 'worker': queue.owner, 'started': time.time()}
+            converter = CONVERTERS[os.path.splitext(path)[1].lower()]
+            try:
+                record.update(queue.run(key, converter, path, eventWindow=eventWindow,
+                                        queueDepth=queueDepth))
+                record['status'] = 'ok'
+            except Exception as e:
+                print(f"[{queue.owner}] 处理 {path} 时出错: {e}")
+                record['status'] = 'failed'
+                record['error'] = repr(e)
+            record['finished'] = time.time()
+            if queue.complete(key, record):
+                processed += 1
+        if not pending:
+            return processed
+        # 剩余任务都被其它 worker 持有或在等待重试，等待其完成、租约过期或退避结束
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程/多机批量转换 .trc 文件（共享目录任务队列）')
+    parser.add_argument('root_dir', help='包含 .trc 文件的顶级目录')
+    parser.add_argument('queue_dir', help='共享的队列目录（租约与完成记录）')
+    parser.add_argument('--workers', type=int, default=1, help='本机启动的 worker 进程数')
+    parser.add_argument('--lease-timeout', type=float, default=LEASE_TIMEOUT)
+    parser.add_argument('--heartbeat', type=float, default=HEARTBEAT)
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help='等待其它 worker 时重新扫描队列的间隔秒数')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                        help='失败任务的最大尝试次数')
+    parser.add_argument('--retry-backoff', type=float, default=RETRY_BACKOFF,
+                        help='失败任务首次重试前的等待秒数，之后每次失败翻倍')
+    parser.add_argument('--event-window', type=float, nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='只写出事件前后若干秒的数据，例如 --event-window 10 5')
+    parser.add_argument('--queue-depth', type=int, default=CANInfo.QUEUE_DEPTH,
+                        help='转换流水线读/写队列深度，0 为串行处理')
+    args = parser.parse_args()
+
+    worker_args = (args.root_dir, args.queue_dir, args.event_window,
+                   args.lease_timeout, args.heartbeat, args.queue_depth,
+                   args.poll_interval, args.max_attempts, args.retry_backoff)
+    if args.workers <= 1:
+        run_worker(*worker_args)
+        return
+    procs = [multiprocessing.Process(target=run_worker, args=worker_args)
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+if __name__ == '__main__':
+    main()
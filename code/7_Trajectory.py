@@ -0,0 +1,146 @@
+import os
+import numpy as np
+import pandas as pd
+
+# WGS84 椭球参数
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+# 相邻两点位移小于该值（m）时认为静止，航向沿用上一次的值
+MIN_STEP = 0.01
+
+# 缓存文件格式版本，计算方法改变时加 1 使旧缓存失效（2：不再包含同步前的行）
+CACHE_VERSION = 2
+
+
+def geodetic_to_ecef(lat, lon, alt):
+    """ 经纬度（度）、高度（m）批量转换为 ECEF 坐标（m） """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    x = (n + alt) * cos_lat * np.cos(lon)
+    y = (n + alt) * cos_lat * np.sin(lon)
+    z = (n * (1 - WGS84_E2) + alt) * sin_lat
+    return x, y, z
+
+
+def geodetic_to_enu(lat, lon, alt, ref):
+    """
+    经纬度批量转换为以 ref=(lat0, lon0, alt0) 为原点的东-北-天（ENU）坐标（m）。
+    全部为 NumPy 向量运算，替代逐点调用 pyproj 的循环。
+    """
+    lat0, lon0, alt0 = ref
+    x, y, z = geodetic_to_ecef(lat, lon, alt)
+    x0, y0, z0 = geodetic_to_ecef(lat0, lon0, alt0)
+    dx, dy, dz = x - x0, y - y0, z - z0
+
+    phi, lam = np.radians(lat0), np.radians(lon0)
+    sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+    sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+    east = -sin_lam * dx + cos_lam * dy
+    north = -sin_phi * cos_lam * dx - sin_phi * sin_lam * dy + cos_phi * dz
+    up = cos_phi * cos_lam * dx + cos_phi * sin_lam * dy + sin_phi * dz
+    return east, north, up
+
+
+def path_length(east, north):
+    """ 水平面内累计路径长度（m），首点为 0 """
+    step = np.hypot(np.diff(east), np.diff(north))
+    return np.concatenate(([0.0], np.cumsum(step)))[:len(east)]
+
+
+def heading(east, north):
+    """
+    由相邻位移计算航向（度，正北为 0，顺时针为正，范围 [0, 360)）。
+    静止点沿用上一次有效航向，首点取第一段有效航向。
+    """
+    de, dn = np.diff(east), np.diff(north)
+    head = np.degrees(np.arctan2(de, dn)) % 360.0
+    moving = np.hypot(de, dn) >= MIN_STEP
+    if not moving.any():
+        return np.full(len(east), np.nan)
+    # 前向填充：静止段取之前最近一次运动段的航向
+    idx = np.where(moving, np.arange(len(head)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    first = np.argmax(moving)
+    head = head[idx]
+    head[:first] = head[first]
+    return np.concatenate(([head[0]], head))
+
+
+def load_fixes(csv_file):
+    """
+    从 1_CANInfo_Read.py 输出的 CSV 中只读取 0x601 经纬度与 0x602 高度，
+    返回 (时间[s], 纬度, 经度, 高度)；没有高度时高度取 0。
+    与 5_Derived_Signals.load_signal_arrays 一致，文件中有同步报文时丢弃第一个 0x600
+    之前写出的行（其 TimeMs 等于 TimeOffset），使轨迹与派生信号、Trial 共用同一时间轴。
+    """
+    data = pd.read_csv(csv_file,
+                       usecols=['TimeOffset', 'TimeMs', 'PosLon', 'PosLat', 'Altitude'],
+                       na_values=['N/A'])
+    time_ms = data['TimeMs'].to_numpy(dtype=float)
+    pre_sync = time_ms == data['TimeOffset'].to_numpy(dtype=float)
+    if not pre_sync.all():
+        time_ms = np.where(pre_sync, np.nan, time_ms)
+    time_sec = time_ms / 1000.0
+    lat = data['PosLat'].to_numpy(dtype=float)
+    lon = data['PosLon'].to_numpy(dtype=float)
+    alt = data['Altitude'].to_numpy(dtype=float)
+
+    fix = ~np.isnan(lat) & ~np.isnan(lon) & ~np.isnan(time_sec)
+    has_alt = ~np.isnan(alt) & ~np.isnan(time_sec)
+    if has_alt.any():
+        alt_fix = np.interp(time_sec[fix], time_sec[has_alt], alt[has_alt])
+    else:
+        alt_fix = np.zeros(fix.sum())
+    return time_sec[fix], lat[fix], lon[fix], alt_fix
+
+
+def compute_trajectory(time_sec, lat, lon, alt, ref=None):
+    """ 批量计算 ENU 轨迹、累计路径长度与航向，ref 为空时以第一个定位点为原点 """
+    if ref is None:
+        ref = (lat[0], lon[0], alt[0]) if len(lat) else (0.0, 0.0, 0.0)
+    east, north, up = geodetic_to_enu(lat, lon, alt, ref)
+    return {
+        'TimeSec': time_sec,
+        'East': east,
+        'North': north,
+        'Up': up,
+        'PathLength': path_length(east, north),
+        'Heading': heading(east, north),
+        'Ref': np.asarray(ref, dtype=float),
+    }
+
+
+def load_trajectory(csv_file, ref=None, use_cache=True):
+    """
+    读取单个试验的轨迹，结果缓存为同目录下 <原文件名>_traj.npz。
+    源 CSV 的大小/修改时间或参考点改变时自动重新计算。
+    """
+    base, _ = os.path.splitext(csv_file)
+    cache_file = base + '_traj.npz'
+    st = os.stat(csv_file)
+    key = np.array([CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+    ref_key = np.full(3, np.nan) if ref is None else np.asarray(ref, dtype=float)
+
+    if use_cache and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if (np.array_equal(cached['_key'], key) and
+                    np.array_equal(cached['_ref'], ref_key, equal_nan=True)):
+                return {k: cached[k] for k in cached.files if not k.startswith('_')}
+
+    traj = compute_trajectory(*load_fixes(csv_file), ref=ref)
+    if use_cache:
+        np.savez(cache_file, _key=key, _ref=ref_key, **traj)
+    return traj
+
+
+if __name__ == "__main__":
+    # 修改为你自己的解码 CSV 文件路径
+    input_file = r"C:\Users\17845\Desktop\子刊讨论\PCS Test Data\bicyclist\06-28-2016\DGPS and carrier data\4A-30-15-A-1-H.csv"
+
+    traj = load_trajectory(input_file)
+    print(f"定位点数: {len(traj['TimeSec'])}，路径长度: {traj['PathLength'][-1]:.2f} m")
@@ -0,0 +1,157 @@
+import importlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+
+# 5_Derived_Signals.py 文件名以数字开头，只能通过 importlib 导入
+DerivedSignals = importlib.import_module('5_Derived_Signals')
+
+# 默认 LRU 缓存内存上限（字节）
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+# 列式存储格式版本，格式或内容改变时加 1 使旧存储失效（2：不再包含同步前的行）
+STORE_VERSION = 2
+
+
+class SignalCache:
+    """
+    按字节数限制的 LRU 缓存，键为 (存储目录, 信号名)，值为 (时间, 数值) 数组。
+    超出内存上限时淘汰最久未使用的信号；单个信号超过上限时不缓存。
+    """
+    def __init__(self, budget=MEMORY_BUDGET):
+        self.budget = budget
+        self.nbytes = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+        return item
+
+    def put(self, key, item):
+        size = item[0].nbytes + item[1].nbytes
+        if size > self.budget:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[0].nbytes + old[1].nbytes
+        self._items[key] = item
+        self.nbytes += size
+        while self.nbytes > self.budget:
+            _, (t, v) = self._items.popitem(last=False)
+            self.nbytes -= t.nbytes + v.nbytes
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+
+# 所有 Trial 默认共用一个缓存，遍历大量试验时总内存仍受 MEMORY_BUDGET 限制
+DEFAULT_CACHE = SignalCache()
+
+
+def _source_stamp(csv_file):
+    st = os.stat(csv_file)
+    return [STORE_VERSION, st.st_size, st.st_mtime_ns]
+
+
+def build_signal_store(csv_file, store_dir):
+    """
+    将 1_CANInfo_Read.py 输出的 CSV 按信号拆成列式存储：
+      store_dir/<信号名>.npy   形状 (2, n)，第 0 行为时间（s），第 1 行为数值
+      store_dir/index.json     信号列表、点数与源文件标记
+    之后读取某个信号只需读取对应的 .npy 文件。
+    """
+    signals = DerivedSignals.load_signal_arrays(csv_file)
+    os.makedirs(store_dir, exist_ok=True)
+    for name, (t, v) in signals.items():
+        np.save(os.path.join(store_dir, name + '.npy'), np.vstack((t, v)))
+    index = {
+        'source': os.path.basename(csv_file),
+        'stamp': _source_stamp(csv_file),
+        'signals': {name: len(t) for name, (t, v) in signals.items()},
+    }
+    # index.json 最后写入，存在即表示存储完整
+    tmp = os.path.join(store_dir, 'index.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(store_dir, 'index.json'))
+    return index
+
+
+class Trial:
+    """
+    已转换试验的惰性访问对象：
+        trial = Trial('xxx.csv')
+        t, v = trial.signal('Speed2D')
+    首次打开时若列式存储不存在或已过期，则从 CSV 建立一次（<原文件名>_signals/）；
+    之后每个信号在第一次访问时才读取，并放入 LRU 缓存。
+    """
+    def __init__(self, csv_file, cache=DEFAULT_CACHE):
+        self.csv_file = csv_file
+        base, _ = os.path.splitext(csv_file)
+        self.name = os.path.basename(base)
+        self.store_dir = base + '_signals'
+        self.cache = cache
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            index_file = os.path.join(self.store_dir, 'index.json')
+            index = None
+            if os.path.exists(index_file):
+                with open(index_file, encoding='utf-8') as f:
+                    index = json.load(f)
+                # 只有源 CSV 仍存在且已改变时才重建；只拷贝了存储目录时直接使用
+                if os.path.exists(self.csv_file) and index['stamp'] != _source_stamp(self.csv_file):
+                    index = None
+            if index is None:
+                index = build_signal_store(self.csv_file, self.store_dir)
+            self._index = index
+        return self._index
+
+    @property
+    def signals(self):
+        """ 该试验包含的信号名列表 """
+        return list(self.index['signals'])
+
+    def __contains__(self, name):
+        return name in self.index['signals']
+
+    def signal(self, name):
+        """ 返回 (时间[s], 数值) 两个 ndarray；信号不存在时抛出 KeyError """
+        if name not in self:
+            raise KeyError(f"{self.name} 中没有信号 {name}")
+        key = (self.store_dir, name)
+        item = self.cache.get(key)
+        if item is None:
+            data = np.load(os.path.join(self.store_dir, name + '.npy'))
+            item = (data[0], data[1])
+            self.cache.put(key, item)
+        return item
+
+    def __repr__(self):
+        return f"Trial({self.csv_file!r})"
+
+
+def iter_trials(root_dir, cache=DEFAULT_CACHE):
+    """ 遍历目录下所有已转换的试验（与 .trc 同名的 .csv） """
+    for current_dir, sub_dirs, files in os.walk(root_dir):
+        for file in sorted(files):
+            base, ext = os.path.splitext(file)
+            if ext.lower() == '.trc' and base + '.csv' in files:
+                yield Trial(os.path.join(current_dir, base + '.csv'), cache)
+
+
+if __name__ == "__main__":
+    # 修改为你自己的数据集顶级目录
+    root_dir = r"C:\Users\17845\Desktop\子刊讨论\Mannequin Test Dataset"
+
+    for trial in iter_trials(root_dir):
+        if 'Speed2D' not in trial:
+            continue
+        t, v = trial.signal('Speed2D')
+        print(f"{trial.name}: {len(t)} 点，最大 Speed2D {v.max():.2f}")
@@ -0,0 +1,78 @@
+import importlib
+import json
+import os
+import matplotlib.pyplot as plt
+import pandas as pd
+
+# 8_Trial.py 文件名以数字开头，只能通过 importlib 导入
+TrialStore = importlib.import_module('8_Trial')
+
+
+def load_index(pyramid_dir):
+    with open(os.path.join(pyramid_dir, 'index.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def choose_level(levels, t0, t1, pixel_width):
+    """
+    选取最粗的、在 [t0, t1] 内仍能保证每个像素至少一个桶的级别；
+    若最细一级的桶也比像素宽（放得很大），返回 None，表示应直接读原始数据。
+    """
+    span = t1 - t0
+    for level in sorted(levels, reverse=True):
+        if span / level >= pixel_width:
+            return level
+    return None
+
+
+def query_summary(pyramid_dir, signal, t0, t1, pixel_width):
+    """
+    按时间范围和显示宽度（像素）查询摘要，返回 (级别, DataFrame[TimeSec, Min, Max, Mean, Count])；
+    放大到最细一级也不够时返回 (None, None)。只读取所选级别的单个信号文件。
+    """
+    level = choose_level(load_index(pyramid_dir)['levels'], t0, t1, pixel_width)
+    if level is None:
+        return None, None
+    data = pd.read_csv(os.path.join(pyramid_dir, f'{level}s', signal + '.csv'))
+    data = data[(data['TimeSec'] + level > t0) & (data['TimeSec'] < t1)]
+    return level, data.reset_index(drop=True)
+
+
+def plot_range(csv_file, signal, t0=None, t1=None, pixel_width=1200):
+    """
+    绘制解码 CSV 中某个信号在 [t0, t1]（秒）内的曲线：缩小时画摘要的 min/max 包络与均值，
+    放大到摘要分辨率不够时改为通过 Trial 读取该信号的原始数据。
+    """
+    base, _ = os.path.splitext(csv_file)
+    pyramid_dir = base + '_pyramid'
+    info = load_index(pyramid_dir)['signals'][signal]
+    t0 = info['start'] if t0 is None else t0
+    t1 = info['end'] if t1 is None else t1
+
+    plt.figure(figsize=(12, 8))
+    level, data = query_summary(pyramid_dir, signal, t0, t1, pixel_width)
+    if level is not None:
+        plt.fill_between(data['TimeSec'], data['Min'], data['Max'], step='post',
+                         alpha=0.3, label=f'{signal} min/max ({level}s)')
+        plt.step(data['TimeSec'], data['Mean'], where='post', label=f'{signal} mean ({level}s)')
+    else:
+        t, v = TrialStore.Trial(csv_file).signal(signal)
+        mask = (t >= t0) & (t <= t1)
+        plt.plot(t[mask], v[mask], label=signal)
+
+    plt.xlim(t0, t1)
+    plt.xlabel('Time (seconds)', fontsize=14)
+    plt.ylabel(signal, fontsize=14)
+    plt.title(f'{signal} vs Time', fontsize=16)
+    plt.legend(fontsize=12)
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    # 修改为你自己的解码 CSV 文件路径
+    input_file = r"C:\Users\17845\Desktop\子刊讨论\PCS Test Data\bicyclist\06-28-2016\DGPS and carrier data\4A-30-15-A-1-H.csv"
+
+    # 全程概览：读取摘要金字塔；传入较小的 t0/t1 放大时自动改读原始数据
+    plot_range(input_file, 'Speed2D')